@@ -3,33 +3,148 @@ from tkinter import ttk, messagebox, simpledialog
 import serial
 import serial.tools.list_ports
 import threading
+import queue
 import json
+import marshal
+import codecs
+import hashlib
+import bisect
+import select
 import time
 import os
 
 PROFILES_FILE = "profiles.json"
+PROFILES_BIN = "profiles.bin"
+MAX_LOG_LINES = 5000
+PORTS_CACHE_TTL = 2.0
+READ_CHUNK = 8192
+
+def encode_command(cmd, is_hex):
+    if is_hex:
+        return bytes.fromhex(cmd)
+    return (cmd + "\r\n").encode()
+
+def prepare_profile(profile):
+    is_hex = profile.get("is_hex", False)
+    for step in profile.get("steps", []):
+        try:
+            step["_encoded"] = encode_command(step["cmd"], is_hex)
+        except (KeyError, TypeError, ValueError):
+            step.pop("_encoded", None)
+    return profile
+
+def load_sidecar():
+    try:
+        with open(PROFILES_BIN, "rb") as f:
+            json_mtime, json_size, profiles = marshal.loads(f.read())
+        st = os.stat(PROFILES_FILE)
+        if json_mtime != st.st_mtime_ns or json_size != st.st_size:
+            return None
+    except Exception:
+        return None
+    if not isinstance(profiles, dict):
+        return None
+    for profile in profiles.values():
+        if not isinstance(profile, dict) or not isinstance(profile.get("steps", []), list):
+            return None
+        if not all(isinstance(step, dict) and isinstance(step.get("cmd"), str) for step in profile.get("steps", [])):
+            return None
+    return profiles
 
 def load_profiles():
-    if os.path.exists(PROFILES_FILE):
-        with open(PROFILES_FILE, "r") as f:
-            return json.load(f)
-    return {}
-
-def save_profiles(profiles):
-    with open(PROFILES_FILE, "w") as f:
-        json.dump(profiles, f, indent=4)
+    profiles = load_sidecar()
+    if profiles is None:
+        try:
+            with open(PROFILES_FILE, "rb") as f:
+                profiles = json.loads(f.read())
+        except FileNotFoundError:
+            return {}
+    for profile in profiles.values():
+        prepare_profile(profile)
+    return profiles
+
+def strip_cached(profiles):
+    return {
+        name: {**profile, "steps": [
+            {k: v for k, v in step.items() if not k.startswith("_")}
+            for step in profile.get("steps", [])
+        ]}
+        for name, profile in profiles.items()
+    }
+
+def write_atomic(path, blob, durable=False):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(blob)
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if durable and os.name == "posix":
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+_json_write_lock = threading.Lock()
+_json_pending_lock = threading.Lock()
+_json_pending = None
+save_errors = queue.Queue()
+
+def _write_profiles(blob, stored, durable):
+    write_atomic(PROFILES_FILE, blob, durable)
+    st = os.stat(PROFILES_FILE)
+    write_atomic(PROFILES_BIN, marshal.dumps((st.st_mtime_ns, st.st_size, stored)))
+
+def _flush_json():
+    global _json_pending
+    with _json_write_lock:
+        with _json_pending_lock:
+            job, _json_pending = _json_pending, None
+        if job is None:
+            return
+        try:
+            _write_profiles(*job, False)
+        except Exception as e:
+            save_errors.put(e)
+
+def save_profiles(profiles, last_save=None, durable=False):
+    global _json_pending
+    stored = strip_cached(profiles)
+    blob = json.dumps(stored, separators=(',', ':')).encode()
+    digest = hashlib.blake2b(blob, digest_size=16).digest()
+    if last_save is not None and last_save[0] == digest and (last_save[1] or not durable):
+        return last_save
+    if durable:
+        with _json_write_lock:
+            with _json_pending_lock:
+                _json_pending = None
+            _write_profiles(blob, stored, True)
+        return digest, True
+    with _json_pending_lock:
+        _json_pending = (blob, stored)
+    threading.Thread(target=_flush_json).start()
+    return digest, False
 
 class SerialPortFrame(ttk.LabelFrame):
-    def __init__(self, parent, index, profiles):
+    def __init__(self, parent, index, app):
         super().__init__(parent, text=f"Port {index+1}")
         self.index = index
-        self.profiles = profiles
+        self.app = app
+        self.profiles = app.profiles
         self.serial_port = None
         self.running = False
         self.listener_thread = None
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._decoder_lock = threading.Lock()
+        self.log_queue = queue.Queue()
+        self.job_q = queue.Queue()
+        self.worker = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker.start()
 
         self.create_widgets()
-        self.refresh_ports()
+        self.after(50, self._drain_log)
 
     def create_widgets(self):
         frame = ttk.Frame(self)
@@ -48,20 +163,26 @@ class SerialPortFrame(ttk.LabelFrame):
         self.connect_btn.grid(row=0, column=5, padx=5)
 
         ttk.Label(frame, text="Profile:").grid(row=1, column=0)
-        self.profile_combo = ttk.Combobox(frame, values=list(self.profiles.keys()), width=20)
+        self.profile_combo = ttk.Combobox(frame, values=self.app._profile_names, width=20)
         self.profile_combo.grid(row=1, column=1, columnspan=2)
+        self.profile_combo.bind("<KeyRelease>", self._filter_profiles)
 
         ttk.Button(frame, text="Execute", command=self.execute_profile).grid(row=1, column=5, padx=5)
 
-        self.output_text = tk.Text(self, height=10, width=90, wrap="word")
-        self.output_text.grid(row=1, column=0, padx=5, pady=5)
+        self.output_list = tk.Listbox(self, height=10, width=90)
+        self.output_list.grid(row=1, column=0, padx=5, pady=5)
 
     def refresh_ports(self):
-        ports = [port.device for port in serial.tools.list_ports.comports()]
+        self.app.refresh_all_ports()
+
+    def apply_ports(self, ports):
         self.port_combo['values'] = ports
-        if ports:
+        if ports and not self.port_combo.get():
             self.port_combo.set(ports[0])
 
+    def _filter_profiles(self, event=None):
+        self.profile_combo.configure(values=self.app.match_profiles(self.profile_combo.get()))
+
     def toggle_connection(self):
         if self.running:
             self.disconnect_port()
@@ -72,10 +193,22 @@ class SerialPortFrame(ttk.LabelFrame):
         port = self.port_combo.get()
         try:
             baud = int(self.baud_var.get())
-            self.serial_port = serial.Serial(port, baudrate=baud, bytesize=8, parity='N', stopbits=1, timeout=0.1)
+            serial_port = serial.Serial(bytesize=8, parity='N', stopbits=1, timeout=0.05, inter_byte_timeout=0.005)
+            serial_port.port = port
+            serial_port.baudrate = baud
+            serial_port.dtr = False
+            serial_port.rts = False
+            serial_port.exclusive = True
+            serial_port.open()
+            self.serial_port = serial_port
+            with self._decoder_lock:
+                self._decoder.reset()
             self.running = True
-            self.listener_thread = threading.Thread(target=self.listen_serial, daemon=True)
-            self.listener_thread.start()
+            if os.name == "posix":
+                self.app.register_rx(self)
+            else:
+                self.listener_thread = threading.Thread(target=self.listen_serial, daemon=True)
+                self.listener_thread.start()
             self.connect_btn.config(text="Disconnect")
             self.log(f"✅ Connected to {port} at {baud} baud.")
         except Exception as e:
@@ -83,26 +216,55 @@ class SerialPortFrame(ttk.LabelFrame):
 
     def disconnect_port(self):
         self.running = False
+        self._drop_pending_jobs()
+        self.app.unregister_rx(self)
         if self.serial_port and self.serial_port.is_open:
             self.serial_port.close()
+        with self._decoder_lock:
+            tail = self._decoder.decode(b'', final=True)
+        if tail:
+            self.log(f"⬅️ RX: {tail.strip()}")
         self.connect_btn.config(text="Connect")
         self.log(f"❌ Disconnected.")
 
     def listen_serial(self):
         while self.running and self.serial_port and self.serial_port.is_open:
             try:
-                data = self.serial_port.read(self.serial_port.in_waiting or 1)
+                data = self.serial_port.read(READ_CHUNK)
                 if data:
-                    decoded = data.decode(errors='ignore')
-                    self.log(f"⬅️ RX: {decoded.strip()}")
+                    if len(data) == READ_CHUNK:
+                        data += self.serial_port.read(self.serial_port.in_waiting)
+                    self._on_rx(data)
             except Exception as e:
                 self.log(f"❗ Listen Error: {e}")
                 break
-            time.sleep(0.01)
+
+    def _on_rx(self, data):
+        with self._decoder_lock:
+            decoded = self._decoder.decode(data, final=False)
+        if decoded:
+            self.log(f"⬅️ RX: {decoded.strip()}")
 
     def log(self, message):
-        self.output_text.insert(tk.END, message + "\n")
-        self.output_text.see(tk.END)
+        self.log_queue.put(message)
+
+    def _drain_log(self):
+        batch = []
+        try:
+            while True:
+                batch.append(self.log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        if batch:
+            lines = []
+            for message in batch:
+                lines.extend(message.splitlines() or [""])
+            self.output_list.insert(tk.END, *lines)
+            size = self.output_list.size()
+            if size > MAX_LOG_LINES:
+                self.output_list.delete(0, size - MAX_LOG_LINES - 1)
+            self.output_list.see(tk.END)
+        self.after(50, self._drain_log)
 
     def execute_profile(self):
         name = self.profile_combo.get()
@@ -116,37 +278,82 @@ class SerialPortFrame(ttk.LabelFrame):
         steps = profile.get("steps", [])
         is_hex = profile.get("is_hex", False)
 
-        threading.Thread(target=self.send_sequence, args=(steps, is_hex), daemon=True).start()
+        self.job_q.put((list(steps), is_hex))
+
+    def _drop_pending_jobs(self):
+        try:
+            while True:
+                if self.job_q.get_nowait() is None:
+                    self.job_q.put(None)
+                    break
+        except queue.Empty:
+            pass
+
+    def _worker_loop(self):
+        while True:
+            job = self.job_q.get()
+            if job is None:
+                break
+            self.send_sequence(*job)
 
     def send_sequence(self, steps, is_hex):
+        mode = "HEX" if is_hex else "ASCII"
+        chunks = []
+        sent = []
+        error = None
+        deadline = time.monotonic()
         for step in steps:
-            cmd = step["cmd"]
-            delay = step.get("delay", 1.0)
-
             try:
-                if is_hex:
-                    bytes_to_send = bytes.fromhex(cmd)
-                    self.serial_port.write(bytes_to_send)
-                    self.log(f"➡️ Sent (HEX): {cmd}")
-                else:
-                    self.serial_port.write((cmd + "\r\n").encode())
-                    self.log(f"➡️ Sent (ASCII): {cmd}")
-
-                time.sleep(delay)
+                cmd = step["cmd"]
+                delay = step.get("delay", 1.0)
+                encoded = step.get("_encoded")
+                if encoded is None:
+                    encoded = encode_command(cmd, is_hex)
+                chunks.append(encoded)
+                sent.append(cmd)
+
+                if delay > 0:
+                    deadline += delay
+                    self._write_run(chunks, sent, mode)
+                    time.sleep(max(0.0, deadline - time.monotonic()))
 
             except Exception as e:
-                self.log(f"❗ Error: {e}")
+                error = e
                 break
 
+        if chunks:
+            try:
+                self._write_run(chunks, sent, mode)
+            except Exception as e:
+                self.log(f"❗ Error: {e}")
+        if error is not None:
+            self.log(f"❗ Error: {error}")
         self.log("✅ Sequence complete.")
 
+    def _write_run(self, chunks, sent, mode):
+        data = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+        cmds = " | ".join(sent)
+        chunks.clear()
+        sent.clear()
+        self.serial_port.write(data)
+        self.log(f"➡️ Sent ({mode}): {cmds}")
+
 class SerialLoggerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Multi-Port Module Log Tool")
         self.profiles = load_profiles()
+        self._last_save = None
+        self._sorted_names = sorted(self.profiles)
+        self._profile_names = tuple(self._sorted_names)
+        self._ports = []
+        self._ports_time = None
+        self._rx_fds = {}
+        self._rx_lock = threading.Lock()
+        self._rx_thread = None
 
         self.create_widgets()
+        self.root.after(500, self._check_save_errors)
 
     def create_widgets(self):
         header = ttk.Frame(self.root)
@@ -161,18 +368,109 @@ class SerialLoggerApp:
 
         self.port_frames = []
         for i in range(4):
-            frame = SerialPortFrame(grid_frame, i, self.profiles)
+            frame = SerialPortFrame(grid_frame, i, self)
             r, c = divmod(i, 2)  # 2 columns layout
             frame.grid(row=r, column=c, padx=5, pady=5, sticky="nsew")
             self.port_frames.append(frame)
+        self.refresh_all_ports()
+
+    def refresh_all_ports(self):
+        now = time.monotonic()
+        if self._ports_time is None or now - self._ports_time >= PORTS_CACHE_TTL:
+            self._ports = [port.device for port in serial.tools.list_ports.comports()]
+            self._ports_time = now
+        for frame in self.port_frames:
+            frame.apply_ports(self._ports)
+
+    def register_rx(self, frame):
+        with self._rx_lock:
+            self._rx_fds[frame.serial_port.fileno()] = frame
+            if self._rx_thread is None:
+                self._rx_thread = threading.Thread(target=self._rx_loop, daemon=True)
+                self._rx_thread.start()
+
+    def unregister_rx(self, frame):
+        with self._rx_lock:
+            for fd, owner in list(self._rx_fds.items()):
+                if owner is frame:
+                    del self._rx_fds[fd]
+
+    def _rx_loop(self):
+        while True:
+            with self._rx_lock:
+                if not self._rx_fds:
+                    self._rx_thread = None
+                    return
+                fds = list(self._rx_fds)
+            try:
+                ready, _, _ = select.select(fds, [], [], 0.1)
+            except (OSError, ValueError) as e:
+                self._drop_bad_fds(fds, e)
+                continue
+            for fd in ready:
+                with self._rx_lock:
+                    frame = self._rx_fds.get(fd)
+                    if frame is None:
+                        continue
+                    try:
+                        data = os.read(fd, READ_CHUNK)
+                        if not data:
+                            raise OSError("device reports readiness to read but returned no data")
+                    except BlockingIOError:
+                        continue
+                    except OSError as e:
+                        del self._rx_fds[fd]
+                        frame.log(f"❗ Listen Error: {e}")
+                        continue
+                frame._on_rx(data)
+
+    def _drop_bad_fds(self, fds, error):
+        dropped = False
+        for fd in fds:
+            try:
+                select.select([fd], [], [], 0)
+            except (OSError, ValueError):
+                with self._rx_lock:
+                    frame = self._rx_fds.pop(fd, None)
+                if frame is not None:
+                    frame.log(f"❗ Listen Error: {error}")
+                    dropped = True
+        if not dropped:
+            time.sleep(0.1)
+
+    def _check_save_errors(self):
+        try:
+            error = save_errors.get_nowait()
+        except queue.Empty:
+            pass
+        else:
+            self._last_save = None
+            messagebox.showerror("Save Error", f"Could not save profiles: {error}")
+        self.root.after(500, self._check_save_errors)
+
+    def match_profiles(self, prefix):
+        names = self._profile_names
+        if not prefix:
+            return names
+        lo = bisect.bisect_left(names, prefix)
+        hi = bisect.bisect_left(names, prefix + "\U0010ffff", lo)
+        return names[lo:hi]
+
+    def _refresh_profile_names(self):
+        names = tuple(self._sorted_names)
+        if names == self._profile_names:
+            return
+        self._profile_names = names
+        for frame in self.port_frames:
+            frame.profile_combo.configure(values=names)
 
     def new_profile(self):
         name = simpledialog.askstring("New Profile", "Enter profile name:")
         if name and name not in self.profiles:
             self.profiles[name] = {"steps": [], "is_hex": False}
-            save_profiles(self.profiles)
-            for frame in self.port_frames:
-                frame.profile_combo['values'] = list(self.profiles.keys())
+            bisect.insort(self._sorted_names, name)
+            self._last_save = save_profiles(self.profiles, self._last_save)
+            self._refresh_profile_names()
         else:
             messagebox.showinfo("Info", "Profile already exists or invalid name.")
 
@@ -181,9 +479,9 @@ class SerialLoggerApp:
         if name and name in self.profiles:
             if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete profile '{name}'?"):
                 del self.profiles[name]
-                save_profiles(self.profiles)
-                for frame in self.port_frames:
-                    frame.profile_combo['values'] = list(self.profiles.keys())
+                self._sorted_names.pop(bisect.bisect_left(self._sorted_names, name))
+                self._last_save = save_profiles(self.profiles, self._last_save)
+                self._refresh_profile_names()
         else:
             messagebox.showerror("Delete Error", "Profile not found.")
 
@@ -212,42 +510,45 @@ class SerialLoggerApp:
         scrollbar.pack(side="right", fill="y")
 
         step_widgets = []
+        row_frames = []
 
-        def render_steps():
-            for widget in scrollable_frame.winfo_children():
-                widget.destroy()
-            step_widgets.clear()
-
-            for idx, step in enumerate(profile["steps"]):
-                row = ttk.Frame(scrollable_frame)
-                row.pack(fill=tk.X, pady=2)
+        def add_row(step):
+            row = ttk.Frame(scrollable_frame)
+            row.pack(fill=tk.X, pady=2)
 
-                cmd_var = tk.StringVar(value=step["cmd"])
-                delay_var = tk.StringVar(value=str(step.get("delay", 1.0)))
-                step_widgets.append((cmd_var, delay_var))
+            cmd_var = tk.StringVar(value=step["cmd"])
+            delay_var = tk.StringVar(value=str(step.get("delay", 1.0)))
+            step_widgets.append((cmd_var, delay_var))
+            row_frames.append(row)
 
-                ttk.Entry(row, textvariable=cmd_var, width=60).pack(side=tk.LEFT, padx=2)
-                ttk.Entry(row, textvariable=delay_var, width=6).pack(side=tk.LEFT, padx=2)
-                ttk.Button(row, text="↑", width=2, command=lambda i=idx: move_step(i, -1)).pack(side=tk.LEFT)
-                ttk.Button(row, text="↓", width=2, command=lambda i=idx: move_step(i, 1)).pack(side=tk.LEFT)
-                ttk.Button(row, text="❌", command=lambda i=idx: delete_step(i)).pack(side=tk.LEFT)
+            ttk.Entry(row, textvariable=cmd_var, width=60).pack(side=tk.LEFT, padx=2)
+            ttk.Entry(row, textvariable=delay_var, width=6).pack(side=tk.LEFT, padx=2)
+            ttk.Button(row, text="↑", width=2, command=lambda: move_step(row_frames.index(row), -1)).pack(side=tk.LEFT)
+            ttk.Button(row, text="↓", width=2, command=lambda: move_step(row_frames.index(row), 1)).pack(side=tk.LEFT)
+            ttk.Button(row, text="❌", command=lambda: delete_step(row_frames.index(row))).pack(side=tk.LEFT)
 
         def move_step(index, direction):
             new_index = index + direction
-            if 0 <= new_index < len(profile["steps"]):
+            if 0 <= new_index < len(step_widgets):
                 profile["steps"][index], profile["steps"][new_index] = profile["steps"][new_index], profile["steps"][index]
-                render_steps()
+                for a, b in zip(step_widgets[index], step_widgets[new_index]):
+                    value = a.get()
+                    a.set(b.get())
+                    b.set(value)
 
         def delete_step(index):
-            if index < len(profile["steps"]):
+            if index < len(step_widgets):
                 del profile["steps"][index]
-                render_steps()
+                del step_widgets[index]
+                row_frames.pop(index).destroy()
 
         def add_step():
-            profile["steps"].append({"cmd": "", "delay": 1.0})
-            render_steps()
+            step = {"cmd": "", "delay": 1.0}
+            profile["steps"].append(step)
+            add_row(step)
 
-        render_steps()
+        for step in profile["steps"]:
+            add_row(step)
 
         bottom = ttk.Frame(editor)
         bottom.pack(fill=tk.X, pady=10)
@@ -267,15 +568,20 @@ class SerialLoggerApp:
             except ValueError:
                 continue
 
-        self.profiles[name] = {"steps": updated_steps, "is_hex": is_hex_var.get()}
-        save_profiles(self.profiles)
-        for frame in self.port_frames:
-            frame.profile_combo['values'] = list(self.profiles.keys())
+        self.profiles[name] = prepare_profile({"steps": updated_steps, "is_hex": is_hex_var.get()})
+        try:
+            self._last_save = save_profiles(self.profiles, self._last_save, durable=True)
+        except OSError as e:
+            self._last_save = None
+            return messagebox.showerror("Save Error", f"Could not save profiles: {e}")
+        self._refresh_profile_names()
         editor.destroy()
 
     def close(self):
         for frame in self.port_frames:
+            frame.job_q.put(None)
             frame.running = False
+            self.unregister_rx(frame)
             if frame.serial_port and frame.serial_port.is_open:
                 frame.serial_port.close()
         self.root.destroy()